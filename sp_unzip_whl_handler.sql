@@ -2,32 +2,92 @@ create or replace procedure sp_unzip_whl_handler(
     source_stage VARCHAR,
     whl_filename VARCHAR,
     target_stage VARCHAR) 
-returns Table() 
+returns Table(path VARCHAR, size NUMBER, status VARCHAR) 
 language python runtime_version=3.11 
 packages=('snowflake-snowpark-python') 
 handler='unzip_whl_handler' as '
 import snowflake.snowpark as snowpark
 import zipfile
 import tempfile
+import hashlib
+import posixpath
 import re
 import os
-import io
-import sys
-from snowflake.snowpark.functions import col
-from snowflake.snowpark.files import SnowflakeFile
 from snowflake.snowpark import Session
+from snowflake.snowpark.types import StructType, StructField, StringType, LongType
+
+RESULT_SCHEMA = StructType([
+    StructField("PATH", StringType()),
+    StructField("SIZE", LongType()),
+    StructField("STATUS", StringType()),
+])
+
+CHUNK_SIZE = 1024 * 1024
+
+def stage_target_path(member_name, prefix):
+    """
+    Map a wheel member to its path relative to the target stage: keep the ''talend_etl_tooling''
+    structure, move ''data'' files to the root and omit ''dist-info'' folders (returns None).
+    """
+    talend_etl_tooling_prefix = "talend_etl_tooling/"
+    data_folder_prefix = f"{prefix}.data/data/"
+    dist_info_prefix = f"{prefix}.dist-info/"
+
+    if member_name.startswith(talend_etl_tooling_prefix):
+        return member_name
+    if member_name.startswith(data_folder_prefix):
+        return posixpath.basename(member_name)
+    if member_name.startswith(dist_info_prefix):
+        return None
+    return member_name
+
+def list_stage_md5(session, target_stage):
+    """Return {path relative to target_stage: md5} for files already on the stage."""
+    _, _, stage_subpath = target_stage[1:].partition("/")
+    stage_subpath = stage_subpath.strip("/")
+    existing = {}
+    try:
+        rows = session.sql(f"LIST {target_stage}").collect()
+    except Exception:
+        return existing
+    for row in rows:
+        # LIST names are prefixed with the (lowercased) stage name
+        path = row["name"].split("/", 1)[1] if "/" in row["name"] else row["name"]
+        if stage_subpath:
+            if not path.startswith(stage_subpath + "/"):
+                continue
+            path = path[len(stage_subpath) + 1:]
+        existing[path] = row["md5"]
+    return existing
+
+def stream_member(zip_ref, info, local_path):
+    """Copy one zip member to local_path in chunks and return its md5."""
+    digest = hashlib.md5()
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    with zip_ref.open(info) as src, open(local_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
 
 def unzip_whl_handler(session: Session, source_stage: str, whl_filename: str, target_stage: str = None):
     """
     Unzip a .whl file from an internal stage within Snowflake, reorganizing its contents
     to maintain ''talend_etl_tooling'' structure, extract ''data'' files to root,
     and omit ''dist-info'' folders.
+
+    Members are streamed out of the wheel into a temporary layout that mirrors the target
+    stage, files whose stage md5 already matches are skipped, and each target directory is
+    uploaded with a single wildcard PUT. Returns one (path, size, status) row per member.
     """
+    results = []
     try:
         if not source_stage.startswith(''@''):
             source_stage = f''@{source_stage}''
         if target_stage and not target_stage.startswith(''@''):
             target_stage = f''@{target_stage}''
+        if target_stage:
+            target_stage = target_stage.rstrip(''/'')
 
         with tempfile.TemporaryDirectory() as temp_dir:
             print(f"Downloading {whl_filename} from {source_stage} to {temp_dir}...")
@@ -35,94 +95,73 @@ def unzip_whl_handler(session: Session, source_stage: str, whl_filename: str, ta
             local_file_path = os.path.join(temp_dir, whl_filename)
 
             if not os.path.exists(local_file_path):
-                return f"ERROR: Failed to download {whl_filename} from {source_stage}"
+                results.append((whl_filename, 0, f"ERROR: Failed to download {whl_filename} from {source_stage}"))
+                return session.create_dataframe(results, schema=RESULT_SCHEMA)
+
+            pattern = r''^([^-]+(?:-[^-]+)*?)-(\\d+(?:\\.\\d+)*(?:\\.(?:dev|a|b|rc)\\d*)?)-(.+)\\.whl$''
+
+            prefix = ""
 
-            extract_dir = os.path.join(temp_dir, ''extracted_whl'')
-            os.makedirs(extract_dir, exist_ok=True)
+            match = re.match(pattern, whl_filename)
+            if match:
+                prefix = match.group(1) + "-" + match.group(2)
+
+            staged_dir = os.path.join(temp_dir, ''staged'')
+            existing_md5 = list_stage_md5(session, target_stage) if target_stage else {}
+
+            # Target directory (relative to target_stage) -> [(member name, size)] waiting for upload;
+            # each target directory gets its own flat local folder so one wildcard PUT covers it
+            pending = {}
+            local_dirs = {}
 
-            print(f"Extracting {whl_filename} to {extract_dir}...")
-            
             with zipfile.ZipFile(local_file_path, ''r'') as zip_ref:
-                zip_ref.extractall(extract_dir)
-            print("Extraction complete.")
-
-            result_message = f"SUCCESS: Extracted {len(zip_ref.namelist())} files from {whl_filename} locally."
-
-            if target_stage:
-                uploaded_count = 0
-
-                pattern = r''^([^-]+(?:-[^-]+)*?)-(\\d+(?:\\.\\d+)*(?:\\.(?:dev|a|b|rc)\\d*)?)-(.+)\\.whl$''
-
-                prefix = ""
-                
-                match = re.match(pattern, whl_filename)
-                if match:
-                    prefix = match.group(1) + "-" + match.group(2)
-                
-                # Define expected paths within the extracted structure
-                talend_etl_tooling_prefix = "talend_etl_tooling/"
-
-                data_folder_prefix = f"{prefix}.data/data/"
-                dist_info_prefix = f"{prefix}.dist-info/"
-
-                print(f"Starting reorganization and upload to {target_stage}...")
-                
-                # Iterate over all files extracted to the temporary directory
-                for root, dirs, files in os.walk(extract_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        
-                        rel_path_in_extracted = os.path.relpath(file_path, extract_dir)
-                        
-                        target_upload_path = None
-
-                        if rel_path_in_extracted.startswith(talend_etl_tooling_prefix):
-                            target_upload_path = os.path.join(target_stage, rel_path_in_extracted)
-                        elif rel_path_in_extracted.startswith(data_folder_prefix):
-                            target_filename = os.path.basename(file_path)
-                            target_upload_path = os.path.join(target_stage, target_filename)
-                        elif rel_path_in_extracted.startswith(dist_info_prefix):
-                            pass
-                        else:
-                            if os.path.dirname(rel_path_in_extracted) == "": # File directly in the wheel''s root
-                                target_upload_path = os.path.join(target_stage, rel_path_in_extracted)
-                            else:
-                                target_upload_path = os.path.join(target_stage, rel_path_in_extracted)
-
-                        if target_upload_path:
-                            try:
-                                stage_put_dest_dir = os.path.dirname(target_upload_path)
-                                if not stage_put_dest_dir:
-                                    stage_put_dest_dir = target_stage
-                                    
-                                print(f"Uploading {file} to {stage_put_dest_dir}/...")
-                                session.file.put(
-                                    file_path,
-                                    stage_put_dest_dir,
-                                    auto_compress=False,
-                                    overwrite=True
-                                )
-                                uploaded_count += 1
-                            except Exception as upload_error:
-                                result_message += f"\\nWarning: Failed to upload {rel_path_in_extracted} to {stage_put_dest_dir}: {str(upload_error)}"
-
-                result_message += f"\\nReorganized and uploaded {uploaded_count} files to {target_stage}."
-
-            all_extracted_paths = [os.path.relpath(os.path.join(root, file), extract_dir) for root, dirs, files in os.walk(extract_dir) for file in files]
-            
-            sample_files = all_extracted_paths[:5]
-            result_message += f"\\nSample extracted files (from original wheel): {'', ''.join(sample_files)}"
-            if len(all_extracted_paths) > 5:
-                result_message += f" ... and {len(all_extracted_paths) - 5} more"
-
-            return result_message
+                for info in zip_ref.infolist():
+                    if info.is_dir():
+                        continue
+
+                    target_rel_path = stage_target_path(info.filename, prefix)
+                    if target_rel_path is None:
+                        results.append((info.filename, info.file_size, "OMITTED"))
+                        continue
+                    if not target_stage:
+                        results.append((info.filename, info.file_size, "LISTED"))
+                        continue
+
+                    target_dir = posixpath.dirname(target_rel_path)
+                    local_dir = local_dirs.setdefault(target_dir, os.path.join(staged_dir, str(len(local_dirs))))
+                    local_path = os.path.join(local_dir, posixpath.basename(target_rel_path))
+                    md5 = stream_member(zip_ref, info, local_path)
+                    if existing_md5.get(target_rel_path) == md5:
+                        os.remove(local_path)
+                        results.append((info.filename, info.file_size, "UNCHANGED"))
+                        continue
+
+                    pending.setdefault(target_dir, []).append((info.filename, info.file_size))
+
+            print(f"Uploading {sum(len(m) for m in pending.values())} changed files in {len(pending)} PUTs to {target_stage}...")
+
+            for target_dir, members in pending.items():
+                stage_put_dest_dir = f"{target_stage}/{target_dir}" if target_dir else target_stage
+                try:
+                    session.file.put(
+                        os.path.join(local_dirs[target_dir], "*"),
+                        stage_put_dest_dir,
+                        auto_compress=False,
+                        overwrite=True
+                    )
+                    status = "UPLOADED"
+                except Exception as upload_error:
+                    status = f"ERROR: Failed to upload to {stage_put_dest_dir}: {str(upload_error)}"
+                results.extend((name, size, status) for name, size in members)
 
     except zipfile.BadZipFile:
-        return f"ERROR: {whl_filename} is not a valid zip/whl file"
+        results.append((whl_filename, 0, f"ERROR: {whl_filename} is not a valid zip/whl file"))
     except FileNotFoundError:
-        return f"ERROR: File {whl_filename} not found in stage {source_stage}"
+        results.append((whl_filename, 0, f"ERROR: File {whl_filename} not found in stage {source_stage}"))
     except Exception as e:
-        return f"ERROR: An unexpected error occurred: {str(e)}"'
+        results.append((whl_filename, 0, f"ERROR: An unexpected error occurred: {str(e)}"))
+
+    return session.create_dataframe(results, schema=RESULT_SCHEMA)'
 ;
 
 call sp_unzip_whl_handler(
@@ -3,7 +3,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from io import StringIO
+from io import BytesIO, StringIO
 
 # Page configuration
 st.set_page_config(
@@ -16,22 +16,49 @@ st.set_page_config(
 st.title("🔄 Talend Migration Analysis Dashboard")
 st.markdown("Upload your Talend component data to analyze migration complexity and effort estimation.")
 
+@st.cache_data(show_spinner=False)
+def load_component_data(data, file_name):
+    """Load component instances from CSV or Parquet bytes, keeping repeated labels dictionary-encoded."""
+    if file_name.lower().endswith('.parquet'):
+        df = pd.read_parquet(BytesIO(data))
+        for column in ('file', 'component_type'):
+            if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype('category')
+    else:
+        df = pd.read_csv(BytesIO(data), dtype={'file': 'category', 'component_type': 'category'})
+    return df
+
+@st.cache_data(show_spinner=False)
+def aggregate_by_file(data, file_name):
+    """Group component instances per file; keyed on the uploaded bytes so it reruns only for new data."""
+    df = load_component_data(data, file_name)
+    # Collect each file's component types once; every categorizer below reuses this set
+    file_analysis = df.groupby('file', observed=True).agg({
+        'component_type': ['count', lambda x: frozenset(x.unique())],
+        'unique_name': 'count'
+    }).round(2)
+
+    # Flatten column names
+    file_analysis.columns = ['component_count', 'component_types', 'unique_components']
+    return file_analysis.reset_index()
+
 # Sidebar for configuration
 st.sidebar.header("Configuration")
 
 # File upload
-uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
+uploaded_file = st.file_uploader("Choose a CSV or Parquet file", type=["csv", "parquet"])
 
 if uploaded_file is not None:
     # Load data
     try:
-        df = pd.read_csv(uploaded_file)
+        data = uploaded_file.getvalue()
+        df = load_component_data(data, uploaded_file.name)
         st.success(f"File uploaded successfully! {len(df)} rows loaded.")
         
         # Validate columns
         expected_columns = ['file', 'component_type', 'unique_name']
         if not all(col in df.columns for col in expected_columns):
-            st.error(f"CSV must contain columns: {expected_columns}")
+            st.error(f"File must contain columns: {expected_columns}")
             st.stop()
         
         # Data preprocessing
@@ -49,14 +76,7 @@ if uploaded_file is not None:
             st.write(f"Unique components: {df['component_type'].nunique()}")
         
         # Pivot data by file
-        file_analysis = df.groupby('file').agg({
-            'component_type': ['count', lambda x: list(x.unique())],
-            'unique_name': 'count'
-        }).round(2)
-        
-        # Flatten column names
-        file_analysis.columns = ['component_count', 'component_types', 'unique_components']
-        file_analysis = file_analysis.reset_index()
+        file_analysis = aggregate_by_file(data, uploaded_file.name)
         
         # Define complexity rules
         snowflake_components = {
@@ -96,9 +116,7 @@ if uploaded_file is not None:
             else:
                 return "XLarge"
         
-        def calculate_complexity(component_types):
-            components_set = set(component_types)
-            
+        def calculate_complexity(components_set):
             # Remove utility components from complexity calculation
             complexity_relevant_components = components_set - utility_components
             
@@ -117,9 +135,7 @@ if uploaded_file is not None:
             # Medium complexity for mixed or other components
             return "Medium"
         
-        def categorize_database_usage(component_types):
-            components_set = set(component_types)
-            
+        def categorize_database_usage(components_set):
             has_db2 = bool(components_set.intersection(db2_components))
             has_oracle = bool(components_set.intersection(oracle_components))
             has_snowflake = bool(components_set.intersection(snowflake_components))
@@ -389,10 +405,10 @@ if uploaded_file is not None:
         
     except Exception as e:
         st.error(f"Error processing file: {str(e)}")
-        st.info("Please ensure your CSV file has the correct format with columns: index, file, component_type, unique_name")
+        st.info("Please ensure your CSV or Parquet file has the correct format with columns: index, file, component_type, unique_name")
 
 else:
-    st.info("👆 Please upload a CSV file to begin analysis")
+    st.info("👆 Please upload a CSV or Parquet file to begin analysis")
     
     # Show example data format
     st.subheader("📝 Expected CSV Format")